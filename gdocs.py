@@ -31,16 +31,18 @@ Usage from CLI:
 """
 
 import argparse
-import glob
+import io
 import os
+import random
 import re
 import sys
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 
-from google.auth.transport.requests import Request
-from google.oauth2.credentials import Credentials
-from google_auth_oauthlib.flow import InstalledAppFlow
-from googleapiclient.discovery import build
-from googleapiclient.http import MediaFileUpload
+# Google client libraries are imported where they are used, so the CLI's
+# --help and the markdown parser don't pay for loading them.
 
 # Override these with your own paths or set via environment variables
 CREDENTIALS_FILE = os.environ.get(
@@ -53,6 +55,120 @@ SCOPES = [
     "https://www.googleapis.com/auth/documents",
     "https://www.googleapis.com/auth/drive",
 ]
+# Retries with randomized exponential backoff. Reads (get/list) also retry
+# connection errors; writes only retry HTTP statuses, see _execute_write.
+NUM_RETRIES = 6
+# Socket timeout in seconds, replacing build_http()'s 60s default. A stalled
+# read is retried; a write that times out is raised, not resent (see
+# _execute_write), so this is kept well above what a large batchUpdate takes.
+HTTP_TIMEOUT = 300
+
+_FOLDER_MIME = "application/vnd.google-apps.folder"
+_RETRY_STATUSES = frozenset((429, 500, 502, 503, 504))
+
+# Markdown patterns, compiled once at import
+_HEADING_RE = re.compile(r"^(#{1,6})\s+(.*)")
+_BLOCKQUOTE_RE = re.compile(r"^>\s*")
+_CB_RE = re.compile(r"^(\s*)- \[([ x])\]\s+(.*)")
+_BUL_RE = re.compile(r"^(\s*)[-*]\s+(.*)")
+_NUM_RE = re.compile(r"^(\d+)\.\s+(.*)")
+_TITLE_NUM_RE = re.compile(r"^\d+\s+")
+_TABLE_SEP_CHARS = frozenset("|-: \t")
+_HR_MARKERS = frozenset(("---", "***", "___"))
+# Indexed by heading level; _HEADING_RE only matches levels 1-6
+_HEADING_STYLES = (None, "HEADING_1", "HEADING_2", "HEADING_3",
+                   "HEADING_4", "HEADING_5", "HEADING_6")
+
+
+def _strip_and_collect_bold(text, base_index, ranges):
+    """Strip **bold** markers from text and return the cleaned text.
+
+    The (start, end) document indices of each bold run, offset by
+    base_index, are appended to ranges.
+    """
+    if "**" not in text:
+        return text
+    parts = []
+    pos = 0
+    out = base_index
+    while True:
+        a = text.find("**", pos)
+        if a < 0:
+            break
+        b = text.find("**", a + 2)
+        if b < 0:
+            break
+        parts.append(text[pos:a])
+        out += a - pos
+        if b > a + 2:
+            parts.append(text[a + 2:b])
+            ranges.append((out, out + b - a - 2))
+            out += b - a - 2
+        pos = b + 2
+    parts.append(text[pos:])
+    return "".join(parts)
+
+
+def _is_table_separator(row):
+    """True for table rows like |---|:--:|. Row must already start with "|"."""
+    if len(row) < 3 or row[-1] != "|":
+        return False
+    # Anything besides | - : and whitespace makes it a data row
+    return all(c.isspace() for c in set(row) - _TABLE_SEP_CHARS)
+
+
+def _bold_requests(ranges):
+    """Build updateTextStyle requests for (start, end) bold ranges."""
+    return [
+        {"updateTextStyle": {
+            "range": {"startIndex": start, "endIndex": end},
+            "textStyle": {"bold": True},
+            "fields": "bold",
+        }}
+        for start, end in ranges
+    ]
+
+
+def _is_retryable(error):
+    """True for HttpErrors worth retrying: 429, 5xx and rate-limit 403s."""
+    from googleapiclient.errors import HttpError
+
+    if not isinstance(error, HttpError):
+        return False
+    status = error.resp.status
+    if status in _RETRY_STATUSES:
+        return True
+    content = error.content
+    if isinstance(content, bytes):
+        content = content.decode("utf-8", "replace")
+    return status == 403 and (
+        "rateLimitExceeded" in content or "userRateLimitExceeded" in content
+    )
+
+
+def _backoff(attempt, error=None):
+    """Sleep before retry number `attempt`, honoring Retry-After if present."""
+    retry_after = ""
+    if error is not None and getattr(error, "resp", None) is not None:
+        retry_after = error.resp.get("retry-after", "")
+    delay = float(retry_after) if retry_after.isdigit() else min(64, 2 ** attempt)
+    time.sleep(delay + random.random())
+
+
+def _execute_write(request):
+    """Execute a request that is not safe to repeat.
+
+    Only HTTP error responses are retried. After a timeout or dropped
+    connection the write may already have been applied, so those errors
+    are raised instead of resending the request.
+    """
+    for attempt in range(NUM_RETRIES + 1):
+        try:
+            return request.execute()
+        except Exception as e:
+            if attempt == NUM_RETRIES or not _is_retryable(e):
+                raise
+            _backoff(attempt, e)
 
 
 class GoogleDocsClient:
@@ -64,9 +180,20 @@ class GoogleDocsClient:
         self._creds = None
         self._docs = None
         self._drive = None
+        self._local = threading.local()
+        self._folder_cache = {}
 
     def authenticate(self):
         """Authenticate with Google. Opens browser on first run."""
+        # Services built from still-valid credentials can be reused as-is
+        if self._creds and self._creds.valid and self._docs is not None:
+            return self
+
+        from google.auth.transport.requests import Request
+        from google.oauth2.credentials import Credentials
+        from google_auth_oauthlib.flow import InstalledAppFlow
+        from googleapiclient.discovery import build
+
         if os.path.exists(self.token_file):
             self._creds = Credentials.from_authorized_user_file(self.token_file, SCOPES)
 
@@ -81,10 +208,31 @@ class GoogleDocsClient:
             with open(self.token_file, "w") as f:
                 f.write(self._creds.to_json())
 
-        self._docs = build("docs", "v1", credentials=self._creds)
-        self._drive = build("drive", "v3", credentials=self._creds)
+        self._docs = build("docs", "v1", credentials=self._creds,
+                           requestBuilder=self._build_request)
+        self._drive = build("drive", "v3", credentials=self._creds,
+                            requestBuilder=self._build_request)
         return self
 
+    def _build_request(self, http, *args, **kwargs):
+        """Build API requests on a per-thread Http; httplib2 is not thread-safe.
+
+        Each thread keeps its Http, so its keep-alive connections are reused
+        across requests.
+        """
+        from google_auth_httplib2 import AuthorizedHttp
+        from googleapiclient.http import HttpRequest, build_http
+
+        authed = getattr(self._local, "http", None)
+        # Rebuild after authenticate() has loaded new credentials
+        if authed is None or authed.credentials is not self._creds:
+            # build_http() keeps googleapiclient's transport defaults, e.g. not
+            # following 308 "Resume Incomplete" on resumable uploads
+            http = build_http()
+            http.timeout = HTTP_TIMEOUT
+            authed = self._local.http = AuthorizedHttp(self._creds, http=http)
+        return HttpRequest(authed, *args, **kwargs)
+
     @property
     def docs(self):
         if not self._docs:
@@ -101,54 +249,133 @@ class GoogleDocsClient:
 
     def create_folder(self, name, parent_id=None):
         """Create a Drive folder. Returns existing folder if name matches."""
-        query = f"name='{name}' and mimeType='application/vnd.google-apps.folder' and trashed=false"
+        return self._get_or_create_folder(name, parent_id)[0]
+
+    def _get_or_create_folder(self, name, parent_id=None):
+        """Return (folder_id, created), memoized per (name, parent_id)."""
+        key = (name, parent_id)
+        if key in self._folder_cache:
+            return self._folder_cache[key], False
+
+        # Drive query strings escape backslashes and single quotes with a backslash
+        safe = name.replace("\\", "\\\\").replace("'", "\\'")
+        query = f"name='{safe}' and mimeType='{_FOLDER_MIME}' and trashed=false"
         if parent_id:
             query += f" and '{parent_id}' in parents"
-        results = self.drive.files().list(q=query, fields="files(id, name)").execute()
+        results = self.drive.files().list(
+            q=query, fields="files(id, name)"
+        ).execute(num_retries=NUM_RETRIES)
         existing = results.get("files", [])
 
         if existing:
-            return existing[0]["id"]
+            self._folder_cache[key] = existing[0]["id"]
+            return existing[0]["id"], False
 
-        meta = {"name": name, "mimeType": "application/vnd.google-apps.folder"}
+        meta = {"name": name, "mimeType": _FOLDER_MIME}
         if parent_id:
             meta["parents"] = [parent_id]
-        folder = self.drive.files().create(body=meta, fields="id").execute()
-        return folder["id"]
+        folder = _execute_write(self.drive.files().create(body=meta, fields="id"))
+        self._folder_cache[key] = folder["id"]
+        return folder["id"], True
+
+    def _forget_folder(self, file_id):
+        """Drop cached folder lookups that resolve to file_id."""
+        for key, folder_id in list(self._folder_cache.items()):
+            if folder_id == file_id:
+                del self._folder_cache[key]
 
     def share(self, file_id, email, role="writer", message=None):
         """Share a file or folder with an email address."""
-        permission = {"type": "user", "role": role, "emailAddress": email}
-        kwargs = {"fileId": file_id, "body": permission, "sendNotificationEmail": True}
-        if message:
-            kwargs["emailMessage"] = message
         try:
-            self.drive.permissions().create(**kwargs).execute()
+            _execute_write(self._permission_request(file_id, email, role, message))
             return True
         except Exception as e:
             print(f"Warning: Could not share with {email}: {e}")
             return False
 
+    def share_many(self, file_id, emails, role="writer", message=None):
+        """Share a file or folder with several emails in batched HTTP requests.
+
+        Rate-limited and 5xx responses are re-batched with backoff. Returns
+        the list of emails that were shared successfully.
+        """
+        shared = set()
+        retry = []
+        answered = set()
+
+        def callback(request_id, response, exception):
+            k = int(request_id)
+            answered.add(k)
+            if exception is None:
+                shared.add(k)
+            elif _is_retryable(exception):
+                retry.append((k, exception))
+            else:
+                print(f"Warning: Could not share with {emails[k]}: {exception}")
+
+        pending = list(range(len(emails)))
+        for attempt in range(NUM_RETRIES + 1):
+            # Drive rejects batches above 100 inner requests
+            for j in range(0, len(pending), 100):
+                chunk = pending[j:j + 100]
+                batch = self.drive.new_batch_http_request(callback=callback)
+                for k in chunk:
+                    batch.add(self._permission_request(file_id, emails[k], role, message),
+                              request_id=str(k))
+                answered.clear()
+                try:
+                    batch.execute()
+                except Exception as e:
+                    # The batch may have been partly applied, and resending it
+                    # could create duplicate permissions and notification emails.
+                    for k in chunk:
+                        if k not in answered:
+                            print(f"Warning: Could not share with {emails[k]}: {e}")
+
+            if not retry:
+                break
+            if attempt == NUM_RETRIES:
+                for k, e in retry:
+                    print(f"Warning: Could not share with {emails[k]}: {e}")
+                break
+            _backoff(attempt, retry[-1][1])
+            pending = [k for k, _ in retry]
+            retry.clear()
+        return [emails[k] for k in sorted(shared)]
+
+    def _permission_request(self, file_id, email, role, message=None):
+        permission = {"type": "user", "role": role, "emailAddress": email}
+        kwargs = {"fileId": file_id, "body": permission, "sendNotificationEmail": True}
+        if message:
+            kwargs["emailMessage"] = message
+        return self.drive.permissions().create(**kwargs)
+
     def share_public(self, file_id, role="reader"):
         """Make a file publicly accessible."""
         permission = {"type": "anyone", "role": role}
-        self.drive.permissions().create(fileId=file_id, body=permission).execute()
+        _execute_write(self.drive.permissions().create(
+            fileId=file_id, body=permission
+        ))
 
     def move_to_folder(self, file_id, folder_id):
         """Move a file into a folder."""
-        file = self.drive.files().get(fileId=file_id, fields="parents").execute()
+        self._forget_folder(file_id)
+        file = self.drive.files().get(
+            fileId=file_id, fields="parents"
+        ).execute(num_retries=NUM_RETRIES)
         prev_parents = ",".join(file.get("parents", []))
-        self.drive.files().update(
+        _execute_write(self.drive.files().update(
             fileId=file_id, addParents=folder_id,
             removeParents=prev_parents, fields="id, parents"
-        ).execute()
+        ))
 
     def folder_url(self, folder_id):
         return f"https://drive.google.com/drive/folders/{folder_id}"
 
     def delete(self, file_id):
         """Delete a file or folder."""
-        self.drive.files().delete(fileId=file_id).execute()
+        self._forget_folder(file_id)
+        _execute_write(self.drive.files().delete(fileId=file_id))
 
     def list_files(self, folder_id=None, limit=20):
         """List files, optionally within a folder."""
@@ -159,7 +386,7 @@ class GoogleDocsClient:
             q=query, pageSize=limit,
             fields="files(id, name, mimeType, modifiedTime, webViewLink)",
             orderBy="modifiedTime desc"
-        ).execute()
+        ).execute(num_retries=NUM_RETRIES)
         return results.get("files", [])
 
     def check_permissions(self, file_id):
@@ -167,20 +394,22 @@ class GoogleDocsClient:
         meta = self.drive.files().get(
             fileId=file_id,
             fields="capabilities(canEdit,canRename,canAddChildren,canShare,canComment)"
-        ).execute()
+        ).execute(num_retries=NUM_RETRIES)
         return meta.get("capabilities", {})
 
     def rename(self, file_id, new_name):
         """Rename a file or folder."""
-        return self.drive.files().update(
+        self._forget_folder(file_id)
+        return _execute_write(self.drive.files().update(
             fileId=file_id, body={"name": new_name}, fields="id, name"
-        ).execute()
+        ))
 
     # --- Document operations ---
 
     def create_doc(self, title, markdown_text, folder_id=None):
         """Create a Google Doc from markdown. Returns (doc_id, url)."""
-        doc = self.docs.documents().create(body={"title": title}).execute()
+        documents = self.docs.documents()
+        doc = _execute_write(documents.create(body={"title": title}))
         doc_id = doc["documentId"]
 
         if folder_id:
@@ -192,49 +421,55 @@ class GoogleDocsClient:
         if requests:
             for j in range(0, len(requests), 100):
                 chunk = requests[j:j + 100]
-                self.docs.documents().batchUpdate(
+                _execute_write(documents.batchUpdate(
                     documentId=doc_id, body={"requests": chunk}
-                ).execute()
+                ))
 
         url = f"https://docs.google.com/document/d/{doc_id}/edit"
         return doc_id, url
 
     def read_doc(self, doc_id):
         """Read a Google Doc and return text content and image URIs."""
-        doc = self.docs.documents().get(documentId=doc_id).execute()
+        doc = self.docs.documents().get(documentId=doc_id).execute(num_retries=NUM_RETRIES)
         content = doc.get("body", {}).get("content", [])
         inline_objects = doc.get("inlineObjects", {})
 
-        text_parts = []
+        text = io.StringIO()
         images = []
+        add_text = text.write
 
         for element in content:
-            if "paragraph" in element:
-                for elem in element["paragraph"].get("elements", []):
-                    if "textRun" in elem:
-                        text_parts.append(elem["textRun"]["content"])
-                    if "inlineObjectElement" in elem:
-                        obj_id = elem["inlineObjectElement"]["inlineObjectId"]
-                        if obj_id in inline_objects:
-                            props = inline_objects[obj_id]["inlineObjectProperties"]["embeddedObject"]
-                            uri = props.get("imageProperties", {}).get("sourceUri", "")
-                            images.append({"id": obj_id, "uri": uri})
-
-        return {"text": "".join(text_parts), "images": images, "title": doc.get("title", "")}
+            paragraph = element.get("paragraph")
+            if paragraph is None:
+                continue
+            for elem in paragraph.get("elements", ()):
+                text_run = elem.get("textRun")
+                if text_run is not None:
+                    add_text(text_run["content"])
+                inline = elem.get("inlineObjectElement")
+                if inline is not None:
+                    obj_id = inline["inlineObjectId"]
+                    obj = inline_objects.get(obj_id)
+                    if obj is not None:
+                        props = obj["inlineObjectProperties"]["embeddedObject"]
+                        uri = props.get("imageProperties", {}).get("sourceUri", "")
+                        images.append({"id": obj_id, "uri": uri})
+
+        return {"text": text.getvalue(), "images": images, "title": doc.get("title", "")}
 
     def clear_doc(self, doc_id):
         """Remove all content from a Google Doc."""
-        doc = self.docs.documents().get(documentId=doc_id).execute()
+        doc = self.docs.documents().get(documentId=doc_id).execute(num_retries=NUM_RETRIES)
         content = doc.get("body", {}).get("content", [])
         if len(content) > 1:
             end_index = content[-1]["endIndex"] - 1
             if end_index > 1:
-                self.docs.documents().batchUpdate(
+                _execute_write(self.docs.documents().batchUpdate(
                     documentId=doc_id,
                     body={"requests": [{"deleteContentRange": {
                         "range": {"startIndex": 1, "endIndex": end_index}
                     }}]}
-                ).execute()
+                ))
 
     def insert_image(self, doc_id, image_uri, width_pt=250, height_pt=57, center=True):
         """Insert an image at the top of a document."""
@@ -259,18 +494,22 @@ class GoogleDocsClient:
                     "fields": "alignment",
                 }
             })
-        self.docs.documents().batchUpdate(
+        _execute_write(self.docs.documents().batchUpdate(
             documentId=doc_id, body={"requests": requests}
-        ).execute()
+        ))
 
     def upload_image(self, filepath, folder_id=None, public=True):
         """Upload an image to Drive. Returns (file_id, uri for Docs embedding)."""
+        from googleapiclient.http import MediaFileUpload
+
         name = os.path.basename(filepath)
         meta = {"name": name}
         if folder_id:
             meta["parents"] = [folder_id]
         media = MediaFileUpload(filepath, mimetype="image/png")
-        f = self.drive.files().create(body=meta, media_body=media, fields="id").execute()
+        f = _execute_write(self.drive.files().create(
+            body=meta, media_body=media, fields="id"
+        ))
         file_id = f["id"]
         if public:
             self.share_public(file_id)
@@ -280,48 +519,72 @@ class GoogleDocsClient:
     # --- Batch operations ---
 
     def upload_markdown_folder(self, source_dir, folder_name, share_with=None,
-                                share_role="writer", title_prefix="", logo_path=None):
-        """Upload all .md files from a directory into a Google Drive folder."""
-        folder_id = self.create_folder(folder_name)
+                                share_role="writer", title_prefix="", logo_path=None,
+                                workers=8):
+        """Upload all .md files from a directory into a Google Drive folder.
+
+        Up to `workers` documents (at least one) are created concurrently.
+        """
+        folder_id, created = self._get_or_create_folder(folder_name)
         print(f"Folder: {self.folder_url(folder_id)}")
 
-        existing = {f["name"]: f["id"] for f in self.list_files(folder_id)}
+        # A folder we just created has nothing to skip
+        existing = {} if created else {f["name"]: f["id"] for f in self.list_files(folder_id)}
 
         logo_uri = None
         if logo_path and os.path.exists(logo_path):
             _, logo_uri = self.upload_image(logo_path, folder_id)
             print(f"Logo uploaded: {logo_uri}")
 
-        md_files = sorted(glob.glob(os.path.join(source_dir, "*.md")))
-        doc_urls = []
+        with os.scandir(source_dir) as entries:
+            md_files = sorted(
+                e.path for e in entries
+                if e.name.endswith(".md") and not e.name.startswith(".") and e.is_file()
+            )
+        docs = []
 
         for filepath in md_files:
             filename = os.path.basename(filepath)
             title = filename.replace(".md", "").replace("_", " ")
-            title = re.sub(r"^\d+\s+", "", title)
+            title = _TITLE_NUM_RE.sub("", title)
             if title_prefix:
                 title = f"{title_prefix} - {title}"
+            docs.append((title, existing.get(title), filepath))
 
-            if title in existing:
-                url = f"https://docs.google.com/document/d/{existing[title]}/edit"
-                doc_urls.append((title, url))
-                print(f"SKIP (exists): {title}")
-                continue
-
+        def upload(title, filepath):
             with open(filepath, "r", encoding="utf-8") as f:
                 markdown_text = f.read()
 
             doc_id, url = self.create_doc(title, markdown_text, folder_id)
-            print(f"Created: {title} -> {url}")
 
             if logo_uri:
                 self.insert_image(doc_id, logo_uri)
+            return doc_id, url
 
-            doc_urls.append((title, url))
+        # Results are printed here rather than in the workers, so the log
+        # stays in source order and lines from different threads don't mix.
+        doc_urls = []
+        with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+            futures = [None if doc_id else pool.submit(upload, title, filepath)
+                       for title, doc_id, filepath in docs]
+            for (title, doc_id, _), future in zip(docs, futures):
+                if future is None:
+                    url = f"https://docs.google.com/document/d/{doc_id}/edit"
+                    print(f"SKIP (exists): {title}")
+                else:
+                    try:
+                        _, url = future.result()
+                    except BaseException:
+                        # Stop at the first failure, as a serial upload would:
+                        # queued files are dropped, running ones finish.
+                        pool.shutdown(cancel_futures=True)
+                        raise
+                    print(f"Created: {title} -> {url}")
+                doc_urls.append((title, url))
 
         if share_with:
-            for email in (share_with if isinstance(share_with, list) else [share_with]):
-                self.share(folder_id, email, share_role)
+            emails = share_with if isinstance(share_with, list) else [share_with]
+            for email in self.share_many(folder_id, emails, share_role):
                 print(f"Shared with {email} ({share_role})")
 
         return {
@@ -334,8 +597,10 @@ class GoogleDocsClient:
 
     def tree(self, folder_id, indent=0):
         """Print a recursive tree listing of a Drive folder."""
-        files = self.list_files(folder_id=folder_id, limit=50)
-        for f in files:
+        self._print_tree(self._list_subtree(folder_id), folder_id, indent)
+
+    def _print_tree(self, children, folder_id, indent):
+        for f in children.get(folder_id, []):
             mime = f["mimeType"]
             is_folder = "folder" in mime
             is_doc = "document" in mime
@@ -345,7 +610,70 @@ class GoogleDocsClient:
             prefix = "  " * indent
             print(f"{prefix}{icon} {f['name']}")
             if is_folder:
-                self.tree(f["id"], indent + 1)
+                self._print_tree(children, f["id"], indent + 1)
+
+    def _list_subtree(self, folder_id):
+        """Map every folder in the subtree to its children.
+
+        Walks breadth-first, sending one batch request (up to 100 folders)
+        per round and following nextPageToken for large folders. Rate-limited
+        and 5xx listings are re-queued and retried after a backoff.
+        """
+        children = {}
+        seen = {folder_id}
+        queue = deque([(folder_id, None)])
+        in_flight = {}
+        retry = []
+        attempts = {}
+
+        def callback(request_id, response, exception):
+            parent = request_id
+            if exception is not None:
+                if not _is_retryable(exception):
+                    raise exception
+                retry.append(((parent, in_flight[parent]), exception))
+                return
+            files = response.get("files", [])
+            children.setdefault(parent, []).extend(files)
+            for f in files:
+                if "folder" in f["mimeType"] and f["id"] not in seen:
+                    seen.add(f["id"])
+                    queue.append((f["id"], None))
+            token = response.get("nextPageToken")
+            if token:
+                queue.append((parent, token))
+
+        while queue:
+            in_flight.clear()
+            batch = self.drive.new_batch_http_request(callback=callback)
+            for _ in range(min(len(queue), 100)):
+                parent, token = queue.popleft()
+                in_flight[parent] = token
+                batch.add(self.drive.files().list(
+                    q=f"'{parent}' in parents and trashed=false",
+                    pageSize=1000, pageToken=token,
+                    fields="nextPageToken, files(id, name, mimeType)",
+                    orderBy="modifiedTime desc"
+                ), request_id=parent)
+            try:
+                batch.execute()
+            except Exception as e:
+                # Listing is read-only, so a failed batch can be sent again
+                if not _is_retryable(e):
+                    raise
+                retry.extend((item, e) for item in in_flight.items())
+
+            if retry:
+                attempt = 0
+                for item, error in retry:
+                    attempts[item] = attempts.get(item, 0) + 1
+                    if attempts[item] > NUM_RETRIES:
+                        raise error
+                    attempt = max(attempt, attempts[item])
+                    queue.append(item)
+                _backoff(attempt - 1, retry[-1][1])
+                retry.clear()
+        return children
 
     # --- Internal: Markdown parser ---
 
@@ -363,8 +691,16 @@ class GoogleDocsClient:
 
     @staticmethod
     def _markdown_to_requests(markdown_text):
-        """Convert markdown to Google Docs API batch update requests."""
+        """Convert markdown to Google Docs API batch update requests.
+
+        All text goes into a single insertText at index 1; the style
+        requests that follow reference the final document positions.
+        """
+        parts = []
         requests = []
+        bold_ranges = []
+        add_text = parts.append
+        add_request = requests.append
         index = 1
 
         lines = markdown_text.split("\n")
@@ -372,80 +708,98 @@ class GoogleDocsClient:
 
         while i < len(lines):
             line = lines[i]
+            stripped = line.strip()
 
-            if not line.strip():
-                requests.append({"insertText": {"location": {"index": index}, "text": "\n"}})
+            if not stripped:
+                add_text("\n")
                 index += 1
                 i += 1
                 continue
 
+            # Dispatch on the first character so most lines try at most one regex
+            c0 = line[0]
+            s0 = stripped[0]
+
             # Headings
-            heading_match = re.match(r"^(#{1,6})\s+(.*)", line)
+            heading_match = _HEADING_RE.match(line) if c0 == "#" else None
             if heading_match:
                 level = len(heading_match.group(1))
-                text = re.sub(r"\*\*(.*?)\*\*", r"\1", heading_match.group(2).strip())
-                requests.append({"insertText": {"location": {"index": index}, "text": text + "\n"}})
-                style_map = {1: "HEADING_1", 2: "HEADING_2", 3: "HEADING_3",
-                             4: "HEADING_4", 5: "HEADING_5", 6: "HEADING_6"}
-                requests.append({
+                text = heading_match.group(2).strip()
+                text = _strip_and_collect_bold(text, index, bold_ranges)
+                text += "\n"
+                end = index + len(text)
+                add_text(text)
+                add_request({
                     "updateParagraphStyle": {
-                        "range": {"startIndex": index, "endIndex": index + len(text) + 1},
-                        "paragraphStyle": {"namedStyleType": style_map.get(level, "HEADING_4")},
+                        "range": {"startIndex": index, "endIndex": end},
+                        "paragraphStyle": {"namedStyleType": _HEADING_STYLES[level]},
                         "fields": "namedStyleType",
                     }
                 })
-                index += len(text) + 1
+                index = end
                 i += 1
                 continue
 
             # Horizontal rule
-            if line.strip() in ("---", "***", "___"):
+            if s0 in "-*_" and stripped in _HR_MARKERS:
                 rule = "________________________________________\n"
-                requests.append({"insertText": {"location": {"index": index}, "text": rule}})
+                add_text(rule)
                 index += len(rule)
                 i += 1
                 continue
 
             # Blockquote
-            if line.startswith(">"):
-                text = re.sub(r"\*\*(.*?)\*\*", r"\1", re.sub(r"^>\s*", "", line).strip()) + "\n"
-                requests.append({"insertText": {"location": {"index": index}, "text": text}})
-                requests.append({
+            if c0 == ">":
+                text = _BLOCKQUOTE_RE.sub("", line).strip()
+                text = _strip_and_collect_bold(text, index, bold_ranges)
+                text += "\n"
+                end = index + len(text)
+                add_text(text)
+                add_request({
                     "updateParagraphStyle": {
-                        "range": {"startIndex": index, "endIndex": index + len(text)},
+                        "range": {"startIndex": index, "endIndex": end},
                         "paragraphStyle": {"indentStart": {"magnitude": 36, "unit": "PT"}},
                         "fields": "indentStart",
                     }
                 })
-                requests.append({
+                add_request({
                     "updateTextStyle": {
-                        "range": {"startIndex": index, "endIndex": index + len(text) - 1},
+                        "range": {"startIndex": index, "endIndex": end - 1},
                         "textStyle": {"italic": True},
                         "fields": "italic",
                     }
                 })
-                index += len(text)
+                index = end
                 i += 1
                 continue
 
             # Table
-            if "|" in line and line.strip().startswith("|"):
+            if s0 == "|":
                 table_lines = []
-                while i < len(lines) and "|" in lines[i] and lines[i].strip().startswith("|"):
+                pos = index
+                while i < len(lines):
                     row = lines[i].strip()
-                    if re.match(r"^\|[\s\-:|]+\|$", row):
+                    if not row.startswith("|"):
+                        break
+                    if _is_table_separator(row):
                         i += 1
                         continue
-                    cells = [re.sub(r"\*\*(.*?)\*\*", r"\1", c.strip()) for c in row.split("|")[1:-1]]
+                    cells = []
+                    for c in row.split("|")[1:-1]:
+                        cell = _strip_and_collect_bold(c.strip(), pos, bold_ranges)
+                        cells.append(cell)
+                        pos += len(cell) + 1
+                    if not cells:
+                        pos += 1
                     table_lines.append("\t".join(cells))
                     i += 1
                 text = "\n".join(table_lines) + "\n"
-                requests.append({"insertText": {"location": {"index": index}, "text": text}})
+                add_text(text)
                 index += len(text)
                 continue
 
             # Code block
-            if line.strip().startswith("```"):
+            if s0 == "`" and stripped.startswith("```"):
                 code_lines = []
                 i += 1
                 while i < len(lines) and not lines[i].strip().startswith("```"):
@@ -453,11 +807,12 @@ class GoogleDocsClient:
                     i += 1
                 i += 1
                 text = "\n".join(code_lines) + "\n"
-                requests.append({"insertText": {"location": {"index": index}, "text": text}})
-                if len(text) > 1:
-                    requests.append({
+                end = index + len(text)
+                add_text(text)
+                if end - 1 > index:
+                    add_request({
                         "updateTextStyle": {
-                            "range": {"startIndex": index, "endIndex": index + len(text) - 1},
+                            "range": {"startIndex": index, "endIndex": end - 1},
                             "textStyle": {
                                 "weightedFontFamily": {"fontFamily": "Courier New"},
                                 "fontSize": {"magnitude": 9, "unit": "PT"},
@@ -465,20 +820,23 @@ class GoogleDocsClient:
                             "fields": "weightedFontFamily,fontSize",
                         }
                     })
-                index += len(text)
+                index = end
                 continue
 
             # Checkbox
-            cb = re.match(r"^(\s*)- \[([ x])\]\s+(.*)", line)
+            cb = _CB_RE.match(line) if s0 == "-" else None
             if cb:
-                text = re.sub(r"\*\*(.*?)\*\*", r"\1", cb.group(3).strip())
                 prefix = "[x] " if cb.group(2) == "x" else "[ ] "
+                text = _strip_and_collect_bold(
+                    cb.group(3).strip(), index + len(prefix), bold_ranges
+                )
                 full = prefix + text + "\n"
-                requests.append({"insertText": {"location": {"index": index}, "text": full}})
+                end = index + len(full)
+                add_text(full)
                 pts = 36 + (len(cb.group(1)) // 2) * 18
-                requests.append({
+                add_request({
                     "updateParagraphStyle": {
-                        "range": {"startIndex": index, "endIndex": index + len(full)},
+                        "range": {"startIndex": index, "endIndex": end},
                         "paragraphStyle": {
                             "indentStart": {"magnitude": pts, "unit": "PT"},
                             "indentFirstLine": {"magnitude": pts - 18, "unit": "PT"},
@@ -486,47 +844,53 @@ class GoogleDocsClient:
                         "fields": "indentStart,indentFirstLine",
                     }
                 })
-                index += len(full)
+                index = end
                 i += 1
                 continue
 
             # Bullet list
-            bul = re.match(r"^(\s*)[-*]\s+(.*)", line)
+            bul = _BUL_RE.match(line) if s0 in "-*" else None
             if bul:
-                text = "  " + re.sub(r"\*\*(.*?)\*\*", r"\1", bul.group(2).strip()) + "\n"
-                requests.append({"insertText": {"location": {"index": index}, "text": text}})
-                requests.append({
+                text = _strip_and_collect_bold(bul.group(2).strip(), index + 2, bold_ranges)
+                text = "  " + text + "\n"
+                end = index + len(text)
+                add_text(text)
+                add_request({
                     "createParagraphBullets": {
-                        "range": {"startIndex": index, "endIndex": index + len(text)},
+                        "range": {"startIndex": index, "endIndex": end},
                         "bulletPreset": "BULLET_DISC_CIRCLE_SQUARE",
                     }
                 })
-                index += len(text)
+                index = end
                 i += 1
                 continue
 
             # Numbered list
-            num = re.match(r"^(\d+)\.\s+(.*)", line)
+            num = _NUM_RE.match(line) if c0.isdigit() else None
             if num:
-                text = re.sub(r"\*\*(.*?)\*\*", r"\1", num.group(2).strip()) + "\n"
-                requests.append({"insertText": {"location": {"index": index}, "text": text}})
-                requests.append({
+                text = _strip_and_collect_bold(num.group(2).strip(), index, bold_ranges)
+                text += "\n"
+                end = index + len(text)
+                add_text(text)
+                add_request({
                     "createParagraphBullets": {
-                        "range": {"startIndex": index, "endIndex": index + len(text)},
+                        "range": {"startIndex": index, "endIndex": end},
                         "bulletPreset": "NUMBERED_DECIMAL_NESTED",
                     }
                 })
-                index += len(text)
+                index = end
                 i += 1
                 continue
 
             # Regular paragraph
-            text = re.sub(r"\*\*(.*?)\*\*", r"\1", line.strip()) + "\n"
-            requests.append({"insertText": {"location": {"index": index}, "text": text}})
+            text = _strip_and_collect_bold(stripped, index, bold_ranges)
+            text += "\n"
+            add_text(text)
             index += len(text)
             i += 1
 
-        return requests
+        requests.extend(_bold_requests(bold_ranges))
+        return [{"insertText": {"location": {"index": 1}, "text": "".join(parts)}}] + requests
 
 
 # --- DocBuilder for precise formatting ---
@@ -544,19 +908,21 @@ class DocBuilder:
     """
 
     def __init__(self):
+        # Requests are only appended with non-empty style ranges, so they
+        # can be sent without a separate filtering pass.
         self.reqs = []
         self.idx = 1
 
     def text(self, text, heading=None, bold=False):
         self.reqs.append({"insertText": {"location": {"index": self.idx}, "text": text}})
         end = self.idx + len(text)
-        if heading:
+        if heading and end > self.idx:
             self.reqs.append({"updateParagraphStyle": {
                 "range": {"startIndex": self.idx, "endIndex": end},
                 "paragraphStyle": {"namedStyleType": heading},
                 "fields": "namedStyleType"
             }})
-        if bold and len(text.strip()) > 0:
+        if bold and text.strip() and end - 1 > self.idx:
             self.reqs.append({"updateTextStyle": {
                 "range": {"startIndex": self.idx, "endIndex": end - 1},
                 "textStyle": {"bold": True}, "fields": "bold"
@@ -598,13 +964,13 @@ class DocBuilder:
     def blank(self):
         self.text("\n")
 
-    def send(self, doc_id, docs_service, batch_size=35):
-        valid = GoogleDocsClient._filter_valid_requests(self.reqs)
-        for i in range(0, len(valid), batch_size):
-            chunk = valid[i:i + batch_size]
-            docs_service.documents().batchUpdate(
+    def send(self, doc_id, docs_service, batch_size=100):
+        documents = docs_service.documents()
+        for i in range(0, len(self.reqs), batch_size):
+            chunk = self.reqs[i:i + batch_size]
+            _execute_write(documents.batchUpdate(
                 documentId=doc_id, body={"requests": chunk}
-            ).execute()
+            ))
 
 
 # --- CLI ---
@@ -659,7 +1025,7 @@ def main():
             with open(filepath, "r", encoding="utf-8") as f:
                 md = f.read()
             title = args.title or os.path.basename(filepath).replace(".md", "").replace("_", " ")
-            title = re.sub(r"^\d+\s+", "", title)
+            title = _TITLE_NUM_RE.sub("", title)
             if args.prefix:
                 title = f"{args.prefix} - {title}"
             doc_id, url = client.create_doc(title, md, folder_id)